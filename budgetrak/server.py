@@ -6,6 +6,8 @@ It registers all tools with FastMCP and handles communication with Claude Deskto
 """
 
 import os
+import sys
+import logging
 from pathlib import Path
 from typing import Optional
 from dotenv import load_dotenv
@@ -14,33 +16,13 @@ from mcp.server.fastmcp import FastMCP
 # Load environment variables
 load_dotenv()
 
-# Import all our tools
-from budgetrak.tools import (
-    # Drive tools
-    list_drive_files,
-    move_drive_file,
-    create_drive_folder,
-    # Parser tools
-    parse_bank_statement_from_drive,
-    parse_local_pdf,
-    categorize_transaction,
-    # Sheets tools
-    initialize_budget_sheet,
-    save_transactions_to_sheet,
-    get_transactions_from_sheet,
-    query_transactions,
-    get_spending_summary,
-    # Advisor tools
-    get_budget_advice,
-    identify_savings_opportunities,
-    analyze_spending_trends,
-)
+# Tool implementations are imported inside each wrapper below, so the
+# Google API / Gemini client libraries only load when a tool first needs them
 
 # Create FastMCP server
 mcp = FastMCP("BudgetTrak")
 
-print("🚀 Starting BudgetTrak MCP Server...")
-print(f"📁 Working directory: {os.getcwd()}")
+logger = logging.getLogger("budgetrak")
 
 
 # ============================================================================
@@ -65,6 +47,8 @@ def search_drive_files(query: str, max_results: int = 20):
         "Find my December Discover statement"
         → search_drive_files("December Discover")
     """
+    from budgetrak.tools import list_drive_files
+    
     return list_drive_files(query=query, max_results=max_results)
 
 
@@ -82,6 +66,8 @@ def move_file_to_folder(file_id: str, folder_id: str):
     Returns:
         Updated file metadata
     """
+    from budgetrak.tools import move_drive_file
+    
     return move_drive_file(file_id, folder_id)
 
 
@@ -97,6 +83,8 @@ def create_folder(name: str, parent_folder_id: Optional[str] = None):
     Returns:
         Created folder metadata with ID
     """
+    from budgetrak.tools import create_drive_folder
+    
     return create_drive_folder(name, parent_folder_id)
 
 
@@ -128,9 +116,32 @@ def parse_statement(file_id: str):
         2. parse_statement(file_id) → get transactions
         3. save_transactions(...) → store in Google Sheets
     """
+    from budgetrak.tools import parse_bank_statement_from_drive
+    
     return parse_bank_statement_from_drive(file_id)
 
 
+@mcp.tool()
+def parse_statements(file_ids: list):
+    """
+    Parse several bank statement PDFs at once.
+    
+    Downloads and parses the statements concurrently, so this is much
+    faster than calling parse_statement once per file.
+    
+    Args:
+        file_ids: Google Drive file IDs of the bank statement PDFs
+        
+    Returns:
+        List with one result per file, in the same order. Each is the same
+        structure parse_statement returns, or {file_id, error} if that
+        statement could not be parsed.
+    """
+    from budgetrak.tools import parse_bank_statements_from_drive
+    
+    return parse_bank_statements_from_drive(file_ids)
+
+
 @mcp.tool()
 def recategorize_transaction(description: str, amount: float):
     """
@@ -143,9 +154,34 @@ def recategorize_transaction(description: str, amount: float):
     Returns:
         Suggested category name
     """
+    from budgetrak.tools import categorize_transaction
+    
     return categorize_transaction(description, amount)
 
 
+@mcp.tool()
+def recategorize_transactions(transactions: list):
+    """
+    Categorize or re-categorize many transactions at once.
+    
+    Much faster than calling recategorize_transaction in a loop: merchants
+    are deduplicated and sent to Gemini in batches.
+    
+    Args:
+        transactions: List of transaction dictionaries with 'description'
+            (or 'merchant') and 'amount'
+        
+    Returns:
+        List of category names, in the same order as the input
+    """
+    from budgetrak.tools import categorize_transactions_batch
+    
+    return categorize_transactions_batch([
+        (t.get('description') or t.get('merchant', ''), t.get('amount', 0))
+        for t in transactions
+    ])
+
+
 # ============================================================================
 # REGISTER GOOGLE SHEETS TOOLS
 # ============================================================================
@@ -167,6 +203,8 @@ def setup_budget_sheet(sheet_id: str):
         "Set up my budget sheet"
         User provides sheet ID → setup_budget_sheet(sheet_id)
     """
+    from budgetrak.tools import initialize_budget_sheet
+    
     return initialize_budget_sheet(sheet_id)
 
 
@@ -193,6 +231,8 @@ def save_transactions(
         1. parse_statement(file_id) → get data
         2. save_transactions(data['transactions'], data['account_info'])
     """
+    from budgetrak.tools import save_transactions_to_sheet
+    
     return save_transactions_to_sheet(transactions, account_info, sheet_id)
 
 
@@ -212,7 +252,9 @@ def get_recent_transactions(limit: int = 50, sheet_id: Optional[str] = None):
         "Show me my last 10 transactions"
         → get_recent_transactions(limit=10)
     """
-    return get_transactions_from_sheet(sheet_id=sheet_id, limit=limit)
+    from budgetrak.tools import get_transactions_from_sheet, to_compact
+    
+    return to_compact(get_transactions_from_sheet(sheet_id=sheet_id, limit=limit))
 
 
 @mcp.tool()
@@ -247,13 +289,15 @@ def search_transactions(
         "Show me all Amazon transactions"
         → search_transactions(merchant="Amazon")
     """
-    return query_transactions(
+    from budgetrak.tools import query_transactions, to_compact
+    
+    return to_compact(query_transactions(
         category=category,
         start_date=start_date,
         end_date=end_date,
         merchant=merchant,
         sheet_id=sheet_id
-    )
+    ))
 
 
 @mcp.tool()
@@ -280,6 +324,8 @@ def get_spending_summary_by_category(
             end_date="2025-12-31"
           )
     """
+    from budgetrak.tools import get_spending_summary
+    
     return get_spending_summary(
         sheet_id=sheet_id,
         start_date=start_date,
@@ -324,6 +370,8 @@ def get_budget_recommendations(
             end_date="2025-11-30"
           )
     """
+    from budgetrak.tools import get_budget_advice
+    
     return get_budget_advice(
         sheet_id=sheet_id,
         start_date=start_date,
@@ -352,6 +400,8 @@ def find_savings_opportunities(sheet_id: Optional[str] = None):
         "Where can I save money?"
         → find_savings_opportunities()
     """
+    from budgetrak.tools import identify_savings_opportunities
+    
     return identify_savings_opportunities(sheet_id=sheet_id)
 
 
@@ -377,6 +427,8 @@ def analyze_trends(
         "Analyze my overall spending trends"
         → analyze_trends()
     """
+    from budgetrak.tools import analyze_spending_trends
+    
     return analyze_spending_trends(category=category, sheet_id=sheet_id)
 
 
@@ -386,17 +438,26 @@ def analyze_trends(
 
 def main():
     """Main entry point for the MCP server."""
-    print("\n" + "="*60)
-    print("🏦 BUDGETTRAK MCP SERVER")
-    print("="*60)
-    print("\n✅ All tools registered:")
-    print("  📁 Drive: search_drive_files, move_file_to_folder, create_folder")
-    print("  🔍 Parser: parse_statement, recategorize_transaction")
-    print("  📊 Sheets: setup_budget_sheet, save_transactions, get_recent_transactions,")
-    print("           search_transactions, get_spending_summary_by_category")
-    print("  💡 Advisor: get_budget_recommendations, find_savings_opportunities, analyze_trends")
-    print("\n🎯 Ready to accept requests from Claude Desktop!")
-    print("="*60 + "\n")
+    # stdout carries the MCP protocol, so logs go to stderr. Only warnings
+    # and errors by default; set DEBUG=true in .env for detailed logs.
+    logging.basicConfig(
+        stream=sys.stderr,
+        level=logging.DEBUG if os.getenv("DEBUG", "").lower() == "true" else logging.WARNING,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+    
+    logger.info("🚀 Starting BudgetTrak MCP Server...")
+    logger.info("📁 Working directory: %s", os.getcwd())
+    logger.info(
+        "✅ All tools registered:\n"
+        "  📁 Drive: search_drive_files, move_file_to_folder, create_folder\n"
+        "  🔍 Parser: parse_statement, parse_statements, recategorize_transaction,\n"
+        "           recategorize_transactions\n"
+        "  📊 Sheets: setup_budget_sheet, save_transactions, get_recent_transactions,\n"
+        "           search_transactions, get_spending_summary_by_category\n"
+        "  💡 Advisor: get_budget_recommendations, find_savings_opportunities, analyze_trends"
+    )
+    logger.info("🎯 Ready to accept requests from Claude Desktop!")
     
     # Run the MCP server
     mcp.run()
@@ -1,48 +1,44 @@
 """MCP Tools for BudgetTrak"""
 
-from .drive import (
-    list_drive_files,
-    download_drive_file,
-    move_drive_file,
-    create_drive_folder,
-)
+from importlib import import_module
 
-from .parser import (
-    parse_bank_statement_from_drive,
-    parse_local_pdf,
-    categorize_transaction,
-)
+# Tool modules pull in the Google API and Gemini client libraries, so each
+# one is only imported when one of its functions is first accessed (PEP 562)
+_EXPORTS = {
+    'list_drive_files': 'drive',
+    'download_drive_file': 'drive',
+    'download_drive_file_bytes': 'drive',
+    'get_drive_file_checksum': 'drive',
+    'move_drive_file': 'drive',
+    'create_drive_folder': 'drive',
+    'parse_bank_statement_from_drive': 'parser',
+    'parse_bank_statements_from_drive': 'parser',
+    'parse_local_pdf': 'parser',
+    'categorize_transaction': 'parser',
+    'categorize_transactions_batch': 'parser',
+    'initialize_budget_sheet': 'sheets',
+    'save_transactions_to_sheet': 'sheets',
+    'get_transactions_from_sheet': 'sheets',
+    'get_transactions_and_summary': 'sheets',
+    'iter_transactions_from_sheet': 'sheets',
+    'iter_txns': 'sheets',
+    'query_transactions': 'sheets',
+    'get_spending_summary': 'sheets',
+    'to_compact': 'sheets',
+    'get_budget_advice': 'advisor',
+    'identify_savings_opportunities': 'advisor',
+    'analyze_spending_trends': 'advisor',
+    'compare_to_budget': 'advisor',
+}
 
-from .sheets import (
-    initialize_budget_sheet,
-    save_transactions_to_sheet,
-    get_transactions_from_sheet,
-    query_transactions,
-    get_spending_summary,
-)
+__all__ = list(_EXPORTS)
 
-from .advisor import (
-    get_budget_advice,
-    identify_savings_opportunities,
-    analyze_spending_trends,
-    compare_to_budget,
-)
 
-__all__ = [
-    'list_drive_files',
-    'download_drive_file',
-    'move_drive_file',
-    'create_drive_folder',
-    'parse_bank_statement_from_drive',
-    'parse_local_pdf',
-    'categorize_transaction',
-    'initialize_budget_sheet',
-    'save_transactions_to_sheet',
-    'get_transactions_from_sheet',
-    'query_transactions',
-    'get_spending_summary',
-    'get_budget_advice',
-    'identify_savings_opportunities',
-    'analyze_spending_trends',
-    'compare_to_budget',
-]
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    
+    value = getattr(import_module(f'.{module}', __name__), name)
+    globals()[name] = value  # Memoize so later lookups skip __getattr__
+    return value
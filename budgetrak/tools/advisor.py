@@ -1,7 +1,15 @@
+import logging
+from collections import defaultdict
 from typing import List, Dict, Any, Optional
 
 from ..utils import get_gemini_client
-from .sheets import get_transactions_from_sheet, get_spending_summary
+from .sheets import (
+    iter_txns,
+    get_spending_summary,
+    get_transactions_and_summary,
+)
+
+logger = logging.getLogger(__name__)
 
 
 def get_budget_advice(
@@ -10,14 +18,14 @@ def get_budget_advice(
     end_date: Optional[str] = None
 ) -> str:
 
-    print(f"\n💡 Generating budget advice...")
+    logger.info("💡 Generating budget advice...")
     
-    # Get transaction data
-    transactions = get_transactions_from_sheet(sheet_id=sheet_id, limit=200)
-    summary = get_spending_summary(
+    # Get transaction data (one sheet read for both views)
+    transactions, summary = get_transactions_and_summary(
         sheet_id=sheet_id,
         start_date=start_date,
-        end_date=end_date
+        end_date=end_date,
+        limit=200
     )
     
     # Get current balance (from most recent transaction's ending balance)
@@ -37,17 +45,17 @@ def get_budget_advice(
 
 def identify_savings_opportunities(sheet_id: Optional[str] = None) -> str:
 
-    print(f"\n💰 Identifying savings opportunities...")
+    logger.info("💰 Identifying savings opportunities...")
     
-    transactions = get_transactions_from_sheet(sheet_id=sheet_id, limit=500)
-    summary = get_spending_summary(sheet_id=sheet_id)
+    # Only the 20 most recent rows go into the prompt; totals come from the summary
+    transactions, summary = get_transactions_and_summary(sheet_id=sheet_id, limit=20)
     
     gemini = get_gemini_client()
     
     prompt = f"""You are a financial advisor analyzing transactions to find savings opportunities.
 
 Transaction Summary:
-- Total transactions: {len(transactions)}
+- Total transactions: {summary['transaction_count']}
 - Total spent: ${summary['total_spent']:.2f}
 - Total income: ${summary['total_income']:.2f}
 - Net: ${summary['net']:.2f}
@@ -56,7 +64,7 @@ Spending by category:
 {chr(10).join(f"- {cat}: ${amt:.2f}" for cat, amt in summary['by_category'].items())}
 
 Recent transactions (last 20):
-{chr(10).join(f"- {t['date']}: {t['merchant']} (${t['amount']:.2f}) - {t['category']}" for t in transactions[-20:])}
+{chr(10).join(f"- {t['date']}: {t['merchant']} (${t['amount']:.2f}) - {t['category']}" for t in transactions)}
 
 Identify specific savings opportunities:
 1. Subscriptions that might be unused or unnecessary
@@ -68,7 +76,7 @@ Identify specific savings opportunities:
 Be specific and actionable. Format as a numbered list with dollar amounts where possible.
 """
     
-    response = gemini.model.generate_content(prompt)
+    response = gemini.generate_content(prompt)
     return response.text
 
 
@@ -77,23 +85,17 @@ def analyze_spending_trends(
     sheet_id: Optional[str] = None
 ) -> str:
 
-    print(f"\n📊 Analyzing spending trends{f' for {category}' if category else ''}...")
-    
-    transactions = get_transactions_from_sheet(sheet_id=sheet_id, limit=1000)
-    
-    # Filter by category if specified
-    if category:
-        transactions = [t for t in transactions 
-                       if t['category'].lower() == category.lower()]
+    logger.info("📊 Analyzing spending trends for %s...", category or "all categories")
     
-    # Group by month
-    monthly_spending = {}
-    for t in transactions:
+    # Filter by category (if specified) and group by month in one pass,
+    # without materializing the transaction list
+    wanted = category.lower() if category else None
+    monthly_spending = defaultdict(float)
+    for t in iter_txns(sheet_id=sheet_id, limit=1000):
+        if wanted and t.category.lower() != wanted:
+            continue
         # Extract month from date (assuming YYYY-MM-DD format)
-        month = t['date'][:7]  # YYYY-MM
-        if month not in monthly_spending:
-            monthly_spending[month] = 0
-        monthly_spending[month] += t['amount']
+        monthly_spending[t.date[:7]] += t.amount  # YYYY-MM
     
     gemini = get_gemini_client()
     
@@ -114,7 +116,7 @@ Provide:
 Be concise and actionable.
 """
     
-    response = gemini.model.generate_content(prompt)
+    response = gemini.generate_content(prompt)
     return response.text
 
 
@@ -123,7 +125,7 @@ def compare_to_budget(
     sheet_id: Optional[str] = None
 ) -> str:
 
-    print(f"\n🎯 Comparing spending to budget targets...")
+    logger.info("🎯 Comparing spending to budget targets...")
     
     summary = get_spending_summary(sheet_id=sheet_id)
     actual = summary['by_category']
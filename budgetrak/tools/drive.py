@@ -7,12 +7,22 @@ These tools allow Claude to interact with your Google Drive:
 - Move/organize files
 """
 
+import logging
 import os
 import io
 from typing import List, Dict, Optional
 from googleapiclient.http import MediaIoBaseDownload
 
-from ..utils import get_drive_service
+from ..utils import get_drive_service, execute_with_retry, execute_rate_limited
+
+logger = logging.getLogger(__name__)
+
+# Download in 8MB chunks (default is 1MB) so typical statements come
+# down in a single range request
+DOWNLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Retries per download chunk (MediaIoBaseDownload backs off on 429/5xx itself)
+DOWNLOAD_NUM_RETRIES = 5
 
 
 def list_drive_files(
@@ -21,7 +31,7 @@ def list_drive_files(
     max_results: int = 20
 ) -> List[Dict]:
 
-    print(f"🔍 Searching Drive: query='{query}', folder='{folder_id}'")
+    logger.info("🔍 Searching Drive: query='%s', folder='%s'", query, folder_id)
     
     service = get_drive_service()
     
@@ -44,82 +54,98 @@ def list_drive_files(
     
     q = " and ".join(q_parts)
     
-    print(f"  Query: {q}")
+    logger.debug("  Query: %s", q)
     
     # Execute search
-    results = service.files().list(
+    results = execute_with_retry(service.files().list(
         q=q,
         pageSize=max_results,
-        fields="files(id, name, mimeType, modifiedTime, size)",
+        fields="files(id, name, mimeType, modifiedTime, md5Checksum)",
         orderBy="modifiedTime desc"  # Newest first
-    ).execute()
+    ))
     
     files = results.get('files', [])
-    print(f"✅ Found {len(files)} files")
+    logger.info("✅ Found %d files", len(files))
     
     return files
 
 
-def download_drive_file(file_id: str, destination: str) -> str:
+def download_drive_file(
+    file_id: str,
+    destination: str
+) -> str:
 
-    print(f"⬇️  Downloading file {file_id}...")
+    # Save to file (no separate metadata request, the name was only logged)
+    with open(destination, 'wb') as f:
+        f.write(download_drive_file_bytes(file_id))
     
-    service = get_drive_service()
+    logger.info("✅ Downloaded to: %s", destination)
+    return destination
+
+
+def download_drive_file_bytes(file_id: str) -> bytes:
+
+    logger.info("⬇️  Downloading file %s...", file_id)
     
-    # Get file metadata
-    file_metadata = service.files().get(fileId=file_id).execute()
-    print(f"  File: {file_metadata['name']}")
+    service = get_drive_service()
     
-    # Download file content
+    # Download file content into memory
     request = service.files().get_media(fileId=file_id)
     fh = io.BytesIO()
-    downloader = MediaIoBaseDownload(fh, request)
+    downloader = MediaIoBaseDownload(fh, request, chunksize=DOWNLOAD_CHUNK_SIZE)
     
     done = False
     while not done:
-        status, done = downloader.next_chunk()
-        if status:
-            print(f"  Progress: {int(status.progress() * 100)}%")
+        status, done = downloader.next_chunk(num_retries=DOWNLOAD_NUM_RETRIES)
+        if status and logger.isEnabledFor(logging.DEBUG):
+            logger.debug("  Progress: %d%%", int(status.progress() * 100))
     
-    # Save to file
-    with open(destination, 'wb') as f:
-        f.write(fh.getvalue())
+    return fh.getvalue()
+
+
+def get_drive_file_checksum(file_id: str) -> Optional[str]:
+
+    service = get_drive_service()
     
-    print(f"✅ Downloaded to: {destination}")
-    return destination
+    # Drive computes this for uploaded (binary) files like PDFs
+    file_metadata = execute_with_retry(service.files().get(
+        fileId=file_id,
+        fields='md5Checksum'
+    ))
+    return file_metadata.get('md5Checksum')
 
 
 def move_drive_file(file_id: str, destination_folder_id: str) -> Dict:
 
-    print(f"📁 Moving file {file_id} to folder {destination_folder_id}")
+    logger.info("📁 Moving file %s to folder %s", file_id, destination_folder_id)
     
     service = get_drive_service()
     
     # Get current parents
-    file_metadata = service.files().get(
+    file_metadata = execute_with_retry(service.files().get(
         fileId=file_id,
         fields='parents, name'
-    ).execute()
+    ))
     
-    print(f"  Moving: {file_metadata['name']}")
+    logger.debug("  Moving: %s", file_metadata['name'])
     
     # Remove from current parents and add to new parent
     previous_parents = ",".join(file_metadata.get('parents', []))
     
-    updated_file = service.files().update(
+    updated_file = execute_with_retry(service.files().update(
         fileId=file_id,
         addParents=destination_folder_id,
         removeParents=previous_parents,
         fields='id, name, parents'
-    ).execute()
+    ))
     
-    print(f"✅ Moved successfully")
+    logger.info("✅ Moved successfully")
     return updated_file
 
 
 def create_drive_folder(name: str, parent_folder_id: Optional[str] = None) -> Dict:
 
-    print(f"📁 Creating folder: {name}")
+    logger.info("📁 Creating folder: %s", name)
     
     service = get_drive_service()
     
@@ -131,10 +157,11 @@ def create_drive_folder(name: str, parent_folder_id: Optional[str] = None) -> Di
     if parent_folder_id:
         file_metadata['parents'] = [parent_folder_id]
     
-    folder = service.files().create(
+    # Not retried on 5xx, which could create the folder twice
+    folder = execute_rate_limited(service.files().create(
         body=file_metadata,
         fields='id, name'
-    ).execute()
+    ))
     
-    print(f"✅ Created folder: {folder['name']} (ID: {folder['id']})")
+    logger.info("✅ Created folder: %s (ID: %s)", folder['name'], folder['id'])
     return folder
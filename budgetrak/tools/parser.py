@@ -4,83 +4,289 @@ PDF Parser Tools for MCP
 These tools handle parsing bank statements using Gemini AI.
 """
 
+import logging
 import os
-import tempfile
-from typing import Dict, Any
+import re
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
 
-from ..utils import get_gemini_client
-from .drive import download_drive_file
+from ..utils import get_gemini_client, load_cached_statement
+from .drive import download_drive_file_bytes, get_drive_file_checksum
+
+logger = logging.getLogger(__name__)
+
+# Store numbers, dates and punctuation are stripped from merchant names so
+# that e.g. "STARBUCKS #1234" and "STARBUCKS 5678" share one cache entry
+_MERCHANT_NOISE = re.compile(r'[^A-Z]+')
+
+# Merchants common enough to categorize without asking Gemini. Checked in
+# order against the raw description, first match wins (so e.g. UBER EATS
+# must come before UBER).
+_RULE_TABLE: List[Tuple[re.Pattern, str]] = [
+    (re.compile(pattern, re.IGNORECASE), category)
+    for pattern, category in [
+        (r'\b(?:PAYROLL|DIRECT DEP(?:OSIT)?|SALARY)\b', 'Income'),
+        (r'\b(?:ZELLE|VENMO|TRANSFER (?:TO|FROM))\b', 'Transfer'),
+        (r'\b(?:OVERDRAFT|SERVICE FEE|ATM FEE|LATE FEE|INTEREST CHARGE)\b', 'Fees'),
+        (r'\b(?:UBER ?EATS|DOORDASH|GRUBHUB|STARBUCKS|DUNKIN|MCDONALD\'?S|CHIPOTLE'
+         r'|WHOLE FOODS|TRADER JOE\'?S|SAFEWAY|KROGER)\b', 'Food/Dining'),
+        (r'\b(?:UBER|LYFT|SHELL|CHEVRON|EXXON|PARKING)\b', 'Transportation'),
+        (r'\b(?:AMZN|AMAZON|WALMART|TARGET|COSTCO|EBAY|ETSY|BEST ?BUY)\b', 'Shopping'),
+        (r'\b(?:NETFLIX|SPOTIFY|HULU|DISNEY ?PLUS|HBO ?MAX|STEAM ?GAMES)\b', 'Entertainment'),
+        (r'\b(?:AIRBNB|EXPEDIA|MARRIOTT|HILTON|DELTA AIR|UNITED AIR|SOUTHWEST AIR)', 'Travel'),
+        (r'\b(?:RENT[- ]A[- ]CAR|HERTZ|AVIS)\b', 'Travel'),
+        (r'\b(?:COMCAST|XFINITY|VERIZON|AT&T|T-MOBILE|UTILIT(?:Y|IES))', 'Bills/Utilities'),
+        (r'\b(?:CVS|WALGREENS|PHARMACY|DENTAL|CLINIC)\b', 'Healthcare'),
+        (r'\b(?:TUITION|COURSERA|UDEMY)\b', 'Education'),
+        # Not a bare RENT: '-' is a word boundary, so that would also match
+        # e.g. ENTERPRISE RENT-A-CAR or THE RENT CAFE
+        (r'\bRENT(?:AL)? PAYMENT\b|\bMORTGAGE\b', 'Rent/Housing'),
+    ]
+]
+
+# Categories already assigned by Gemini, keyed by (merchant, is_credit).
+# The amount itself rarely changes the category, only its sign does.
+_CATEGORY_CACHE: Dict[Tuple[str, bool], str] = {}
+_CATEGORY_CACHE_SIZE = 4096
+
+# Sent once as the system instruction so each request only carries the
+# transaction itself
+CATEGORY_SYSTEM_PROMPT = """Categorize the bank transaction you are given into ONE of these categories:
+- Income
+- Rent/Housing
+- Food/Dining
+- Transportation
+- Shopping
+- Entertainment
+- Travel
+- Bills/Utilities
+- Healthcare
+- Education
+- Transfer
+- Fees
+- Other
+
+Respond with ONLY the category name, nothing else.
+"""
+
+# Single-label classification does not need the full parsing model.
+# Prefer a model without thinking (flash-lite doesn't think by default):
+# this SDK can't turn thinking off, and thinking tokens count against
+# max_output_tokens, so e.g. gemini-2.5-flash is slower and may use up
+# the budget below before answering.
+CATEGORIZER_MODEL = os.getenv("GEMINI_CATEGORIZER_MODEL", "gemini-2.5-flash-lite")
+
+# Output token caps, with headroom for thinking if the model above does it
+CATEGORY_MAX_OUTPUT_TOKENS = 1024
+CATEGORY_BATCH_MAX_OUTPUT_TOKENS = 4096
+
+# Transactions per Gemini request when categorizing in bulk
+CATEGORY_BATCH_SIZE = 50
+
+_categorizer = None
+_categorizer_lock = threading.Lock()
+
+# Used to run independent Drive/Gemini requests concurrently. FastMCP calls
+# sync tools from its event loop, so asyncio.run() is not available here.
+_executor = ThreadPoolExecutor(max_workers=4)
 
 
 def parse_bank_statement_from_drive(file_id: str) -> Dict[str, Any]:
 
-    print(f"\n{'='*60}")
-    print(f"🏦 PARSING BANK STATEMENT")
-    print(f"{'='*60}")
+    logger.info("🏦 Parsing bank statement %s", file_id)
     
-    # Create temp directory for download
-    with tempfile.TemporaryDirectory() as temp_dir:
-        pdf_path = os.path.join(temp_dir, "statement.pdf")
-        
-        # Step 1: Download from Drive
-        print("\n[1/2] Downloading from Google Drive...")
-        download_drive_file(file_id, pdf_path)
+    # Skip the download and Gemini call if we've parsed this exact file before
+    checksum = get_drive_file_checksum(file_id)
+    digest = f"md5-{checksum}" if checksum else None
+    result = load_cached_statement(digest) if digest else None
+    
+    if result is not None:
+        logger.info("♻️  Using cached parse for checksum %s", checksum)
+    else:
+        # Step 1: Download from Drive (kept in memory, no temp file)
+        logger.info("[1/2] Downloading from Google Drive...")
+        pdf_bytes = download_drive_file_bytes(file_id)
         
         # Step 2: Parse with Gemini
-        print("\n[2/2] Extracting transactions with Gemini AI...")
+        logger.info("[2/2] Extracting transactions with Gemini AI...")
+        # Cached under the same versioned md5 key looked up above
         gemini = get_gemini_client()
-        result = gemini.parse_bank_statement(pdf_path)
-        
-        print(f"\n{'='*60}")
-        print(f"✅ PARSING COMPLETE")
-        print(f"{'='*60}")
-        print(f"Bank: {result['account_info']['bank']}")
-        print(f"Account: ...{result['account_info']['account_number']}")
-        print(f"Period: {result['account_info']['statement_period_start']} to {result['account_info']['statement_period_end']}")
-        print(f"Transactions: {len(result['transactions'])}")
-        print(f"Beginning Balance: ${result['account_info']['beginning_balance']:.2f}")
-        print(f"Ending Balance: ${result['account_info']['ending_balance']:.2f}")
-        
-        return result
+        result = gemini.parse_bank_statement_bytes(pdf_bytes, digest=digest)
+    
+    account_info = result['account_info']
+    logger.info(
+        "✅ Parsed %s ...%s, %s to %s: %d transactions, balance $%.2f → $%.2f",
+        account_info['bank'],
+        account_info['account_number'],
+        account_info['statement_period_start'],
+        account_info['statement_period_end'],
+        len(result['transactions']),
+        account_info['beginning_balance'],
+        account_info['ending_balance'],
+    )
+    
+    return result
+
+
+def parse_bank_statements_from_drive(file_ids: List[str]) -> List[Dict[str, Any]]:
+
+    logger.info("🏦 Parsing %d bank statements...", len(file_ids))
+    
+    def parse_one(file_id: str) -> Dict[str, Any]:
+        # A bad PDF shouldn't throw away the statements that did parse
+        try:
+            return parse_bank_statement_from_drive(file_id)
+        except Exception as e:
+            logger.error("❌ Failed to parse %s: %s", file_id, e)
+            return {'file_id': file_id, 'error': str(e)}
+    
+    # Each statement's download and Gemini call are independent of the others
+    return list(_executor.map(parse_one, file_ids))
 
 
 def parse_local_pdf(pdf_path: str) -> Dict[str, Any]:
 
-    print(f"\n🏦 Parsing local PDF: {pdf_path}")
+    logger.info("🏦 Parsing local PDF: %s", pdf_path)
     
     gemini = get_gemini_client()
     result = gemini.parse_bank_statement(pdf_path)
     
-    print(f"✅ Parsed {len(result['transactions'])} transactions")
+    logger.info("✅ Parsed %d transactions", len(result['transactions']))
     return result
 
 
-def categorize_transaction(description: str, amount: float) -> str:
+def _get_categorizer():
+    global _categorizer
+    with _categorizer_lock:
+        if _categorizer is None:
+            import google.generativeai as genai
+            
+            get_gemini_client()  # Ensures the API key is configured
+            _categorizer = genai.GenerativeModel(
+                CATEGORIZER_MODEL,
+                system_instruction=CATEGORY_SYSTEM_PROMPT,
+                generation_config={'max_output_tokens': CATEGORY_MAX_OUTPUT_TOKENS, 'temperature': 0},
+            )
+    return _categorizer
 
-    gemini = get_gemini_client()
-    
-    prompt = f"""Categorize this transaction into ONE of these categories:
-- Income
-- Rent/Housing
-- Food/Dining
-- Transportation
-- Shopping
-- Entertainment
-- Travel
-- Bills/Utilities
-- Healthcare
-- Education
-- Transfer
-- Fees
-- Other
 
-Transaction: {description}
-Amount: ${amount}
+def _merchant_key(description: str) -> str:
+    return _MERCHANT_NOISE.sub(' ', description.upper()).strip() or description
 
-Respond with ONLY the category name, nothing else.
-"""
+
+def _match_rule(description: str) -> Optional[str]:
+    for pattern, category in _RULE_TABLE:
+        if pattern.search(description):
+            return category
+    return None
+
+
+def _remember_category(key: Tuple[str, bool], category: str) -> None:
+    # Evict the oldest entry once full (dicts keep insertion order)
+    if len(_CATEGORY_CACHE) >= _CATEGORY_CACHE_SIZE:
+        _CATEGORY_CACHE.pop(next(iter(_CATEGORY_CACHE)), None)
+    _CATEGORY_CACHE[key] = category
+
+
+def categorize_transaction(description: str, amount: float) -> str:
+
+    category = _match_rule(description)
+    if category is not None:
+        return category
+    
+    key = (_merchant_key(description), amount < 0)
+    category = _CATEGORY_CACHE.get(key)
+    if category is not None:
+        return category
     
-    response = gemini.model.generate_content(prompt)
+    # Logged so the rule table can be grown from real misses
+    logger.info("No category rule for '%s', asking Gemini", description)
+    response = get_gemini_client().generate_content(
+        f"{description} | ${amount}",
+        model=_get_categorizer()
+    )
+    
+    # A thinking model can spend the whole budget without answering
+    if not response.parts:
+        logger.warning("⚠️  No category returned for '%s', using Other", description)
+        return 'Other'
     category = response.text.strip()
     
+    _remember_category(key, category)
     return category
+
+
+def _categorize_chunk(items: List[Tuple[str, float]]) -> List[str]:
+
+    numbered = "\n".join(
+        f"{i}. {description} | ${amount}"
+        for i, (description, amount) in enumerate(items, 1)
+    )
+    prompt = (
+        "Categorize each of these transactions. Return a JSON array with "
+        f"exactly {len(items)} category names, in the same order.\n\n{numbered}"
+    )
+    
+    response = get_gemini_client().generate_content(
+        prompt,
+        model=_get_categorizer(),
+        generation_config={
+            'response_mime_type': 'application/json',
+            'response_schema': list[str],
+            'max_output_tokens': CATEGORY_BATCH_MAX_OUTPUT_TOKENS,
+            'temperature': 0,
+        },
+    )
+    
+    # Empty or truncated output (e.g. cut off by the token cap) or anything
+    # other than a list of strings is treated like a miscount below
+    try:
+        categories = json.loads(response.text) if response.parts else []
+    except ValueError:
+        categories = None
+    if not isinstance(categories, list) or not all(isinstance(c, str) for c in categories):
+        categories = None
+    
+    # Fall back to one request per transaction if the model miscounted
+    if categories is None or len(categories) != len(items):
+        logger.warning(
+            "⚠️  Batch returned %s categories for %d transactions, retrying individually",
+            "unusable" if categories is None else len(categories), len(items)
+        )
+        return [categorize_transaction(description, amount) for description, amount in items]
+    return [c.strip() for c in categories]
+
+
+def categorize_transactions_batch(items: List[Tuple[str, float]]) -> List[str]:
+
+    keys = [(_merchant_key(description), amount < 0) for description, amount in items]
+    
+    # Only send merchants that no rule covers and we haven't categorized
+    # yet, once each
+    resolved = {}
+    pending = {}
+    for key, item in zip(keys, items):
+        if key in resolved or key in pending:
+            continue
+        category = _match_rule(item[0]) or _CATEGORY_CACHE.get(key)
+        if category is not None:
+            resolved[key] = category
+        else:
+            pending[key] = item
+    
+    if pending:
+        logger.info("🏷️  No category rule for %d merchants, asking Gemini...", len(pending))
+        pending_items = list(pending.values())
+        chunks = [
+            pending_items[i:i + CATEGORY_BATCH_SIZE]
+            for i in range(0, len(pending_items), CATEGORY_BATCH_SIZE)
+        ]
+        
+        categories = [c for chunk in _executor.map(_categorize_chunk, chunks) for c in chunk]
+        for key, category in zip(pending, categories):
+            resolved[key] = category
+            _remember_category(key, category)
+    
+    return [resolved[key] for key in keys]
@@ -1,8 +1,43 @@
+import logging
 import os
-from typing import List, Dict, Any, Optional
+import re
+import json
+import time
+from bisect import bisect_left, bisect_right
+from operator import attrgetter
+from typing import List, Dict, Any, Iterable, Iterator, NamedTuple, Optional, Tuple
 from datetime import datetime
 
-from ..utils import get_sheets_service
+from ..utils import (
+    get_drive_service,
+    get_sheets_service,
+    get_authorized_session,
+    execute_with_retry,
+    execute_rate_limited,
+    retry_with_backoff,
+)
+
+logger = logging.getLogger(__name__)
+
+# Raw Transactions rows are cached briefly per sheet so that back-to-back
+# tool calls (e.g. advice followed by a summary) share a single API read.
+# The sheet's Drive version is kept alongside to revalidate once stale.
+_READ_CACHE: Dict[str, Tuple[float, Optional[str], List[List[Any]]]] = {}
+_CACHE_TTL = 30.0
+
+# Query indexes built from the cached rows above
+_INDEX_CACHE: Dict[str, "TransactionIndex"] = {}
+
+# Statements are appended in one request; very large ones are split into
+# chunks, since oversized append requests tend to fail with 500s
+APPEND_CHUNK_THRESHOLD = 500
+APPEND_CHUNK_SIZE = 250
+
+# Sheets visualization query endpoint, used to run GROUP BY / WHERE on
+# Google's side. Replies are wrapped as `...setResponse({json});`
+_GVIZ_URL = "https://docs.google.com/spreadsheets/d/{sheet_id}/gviz/tq"
+_GVIZ_PAYLOAD = re.compile(r'setResponse\((.*)\)', re.DOTALL)
+_GVIZ_DATE = re.compile(r'Date\((\d+),(\d+),(\d+)')
 
 
 def get_sheet_id_from_env() -> str:
@@ -17,20 +52,20 @@ def get_sheet_id_from_env() -> str:
 
 def initialize_budget_sheet(sheet_id: str) -> Dict:
 
-    print(f"📊 Initializing budget sheet: {sheet_id}")
+    logger.info("📊 Initializing budget sheet: %s", sheet_id)
     
     service = get_sheets_service()
     
     # Get existing sheet info
-    spreadsheet = service.spreadsheets().get(spreadsheetId=sheet_id).execute()
-    print(f"  Sheet name: {spreadsheet['properties']['title']}")
+    spreadsheet = execute_with_retry(service.spreadsheets().get(spreadsheetId=sheet_id))
+    logger.debug("  Sheet name: %s", spreadsheet['properties']['title'])
     
     # Create Transactions sheet if doesn't exist
     sheets = spreadsheet.get('sheets', [])
     has_transactions = any(s['properties']['title'] == 'Transactions' for s in sheets)
     
     if not has_transactions:
-        print("  Creating Transactions sheet...")
+        logger.info("  Creating Transactions sheet...")
         requests = [{
             'addSheet': {
                 'properties': {
@@ -41,24 +76,25 @@ def initialize_budget_sheet(sheet_id: str) -> Dict:
                 }
             }
         }]
-        service.spreadsheets().batchUpdate(
+        execute_with_retry(service.spreadsheets().batchUpdate(
             spreadsheetId=sheet_id,
             body={'requests': requests}
-        ).execute()
+        ))
     
     # Write headers
     headers = [
         ['Date', 'Merchant', 'Amount', 'Category', 'Type', 'Bank', 'Account', 'Notes']
     ]
     
-    service.spreadsheets().values().update(
+    execute_with_retry(service.spreadsheets().values().update(
         spreadsheetId=sheet_id,
         range='Transactions!A1:H1',
         valueInputOption='RAW',
         body={'values': headers}
-    ).execute()
+    ))
+    _READ_CACHE.pop(sheet_id, None)
     
-    print("✅ Sheet initialized")
+    logger.info("✅ Sheet initialized")
     return spreadsheet
 
 
@@ -68,80 +104,320 @@ def save_transactions_to_sheet(
     sheet_id: Optional[str] = None
 ) -> Dict:
 
-    print(f"\n📊 Saving {len(transactions)} transactions to Google Sheets...")
+    logger.info("📊 Saving %d transactions to Google Sheets...", len(transactions))
     
     if sheet_id is None:
         sheet_id = get_sheet_id_from_env()
     
     service = get_sheets_service()
     
-    # Format transactions for sheets
-    rows = []
-    for t in transactions:
-        row = [
+    # Format transactions for sheets (account columns are the same on every row)
+    bank = account_info.get('bank', '')
+    account_number = account_info.get('account_number', '')
+    rows = [
+        [
             t.get('date', ''),
             t.get('merchant', ''),
             t.get('amount', 0),
             t.get('category', ''),
             t.get('type', ''),
-            account_info.get('bank', ''),
-            account_info.get('account_number', ''),
+            bank,
+            account_number,
             t.get('description', '')  # Notes
         ]
-        rows.append(row)
+        for t in transactions
+    ]
     
     # Append to sheet
-    result = service.spreadsheets().values().append(
-        spreadsheetId=sheet_id,
-        range='Transactions!A:H',
-        valueInputOption='RAW',
-        insertDataOption='INSERT_ROWS',
-        body={'values': rows}
-    ).execute()
-    
-    print(f"✅ Added {len(rows)} rows to sheet")
-    print(f"  Updated range: {result['updates']['updatedRange']}")
+    if len(rows) > APPEND_CHUNK_THRESHOLD:
+        chunks = [rows[i:i + APPEND_CHUNK_SIZE] for i in range(0, len(rows), APPEND_CHUNK_SIZE)]
+    else:
+        chunks = [rows]
+    
+    # Appends are only retried when rate limited; after a 5xx the rows may
+    # already have been written, and retrying would duplicate them
+    results = []
+    try:
+        for chunk in chunks:
+            results.append(execute_rate_limited(service.spreadsheets().values().append(
+                spreadsheetId=sheet_id,
+                range='Transactions!A:H',
+                valueInputOption='RAW',
+                insertDataOption='INSERT_ROWS',
+                body={'values': chunk}
+            )))
+    except Exception as e:
+        if not results:
+            raise
+        
+        # Earlier chunks are already in the sheet, so say how far we got;
+        # saving the whole statement again would duplicate them
+        written = sum(r.get('updates', {}).get('updatedRows', 0) for r in results)
+        logger.error("❌ Save failed after %d of %d rows were written to the sheet",
+                     written, len(rows))
+        raise RuntimeError(
+            f"Saving failed after the first {written} of {len(rows)} transactions were "
+            f"already written to the sheet (retry with only the remaining ones): {e}"
+        ) from e
+    finally:
+        _READ_CACHE.pop(sheet_id, None)
+    
+    result = _merge_append_results(results)
+    
+    logger.info("✅ Added %d rows to sheet", len(rows))
+    logger.debug("  Updated range: %s", result['updates']['updatedRange'])
     
     return result
 
 
+def _merge_append_results(results: List[Dict]) -> Dict:
+
+    # Report chunked appends as if they had been a single append
+    if len(results) == 1:
+        return results[0]
+    
+    first_range = results[0]['updates']['updatedRange']
+    last_range = results[-1]['updates']['updatedRange']
+    
+    merged = dict(results[-1])
+    merged['updates'] = dict(
+        results[-1]['updates'],
+        updatedRange=f"{first_range.split(':')[0]}:{last_range.split(':')[-1]}",
+        updatedRows=sum(r['updates'].get('updatedRows', 0) for r in results),
+        updatedCells=sum(r['updates'].get('updatedCells', 0) for r in results),
+    )
+    return merged
+
+
 def get_transactions_from_sheet(
     sheet_id: Optional[str] = None,
     limit: int = 100
 ) -> List[Dict[str, Any]]:
 
-    print(f"📖 Reading transactions from Google Sheets...")
+    logger.debug("📖 Reading transactions from Google Sheets...")
     
+    transactions = list(iter_transactions_from_sheet(sheet_id=sheet_id, limit=limit))
+    
+    logger.info("✅ Retrieved %d transactions", len(transactions))
+    return transactions
+
+
+def iter_transactions_from_sheet(
+    sheet_id: Optional[str] = None,
+    limit: int = 100
+) -> Iterator[Dict[str, Any]]:
+
+    for t in iter_txns(sheet_id, limit):
+        yield t._asdict()
+
+
+def iter_txns(sheet_id: Optional[str] = None, limit: int = 100) -> Iterator["Txn"]:
+
+    # Same as iter_transactions_from_sheet, but yields Txn tuples (date,
+    # merchant, amount, category, type, bank) instead of dicts, for callers
+    # that only aggregate and don't need a dict per row
     if sheet_id is None:
         sheet_id = get_sheet_id_from_env()
     
-    service = get_sheets_service()
-    
-    # Read all data
-    result = service.spreadsheets().values().get(
+    values = _read_transaction_rows(sheet_id)
+    yield from _iter_transactions(_tail(values, limit))  # Get last N rows
+
+
+def _tail(rows: List[List[Any]], limit: int) -> Iterator[List[Any]]:
+
+    # Walk the last rows in place rather than slicing off a copy of them
+    for i in range(max(len(rows) - limit, 0), len(rows)):
+        yield rows[i]
+
+
+class Txn(NamedTuple):
+    """
+    One Transactions row. Used instead of a dict per row; iter_txns yields
+    these, the other public functions return dicts (via _asdict).
+    """
+    date: str
+    merchant: str
+    amount: float
+    category: str
+    type: str
+    bank: str
+    account: str
+    notes: str
+
+
+def _iter_transactions(rows: Iterable[List[Any]]) -> Iterator[Txn]:
+
+    # Convert to transactions, one row at a time
+    for row in rows:
+        if len(row) >= 5:  # Minimum required columns
+            yield Txn(
+                row[0],
+                row[1],
+                float(row[2]) if row[2] else 0,
+                row[3],
+                row[4],
+                row[5] if len(row) > 5 else '',
+                row[6] if len(row) > 6 else '',
+                row[7] if len(row) > 7 else ''
+            )
+
+
+def to_compact(transactions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+
+    # Drop empty fields (usually bank/account/notes) before a list is
+    # serialized back to the MCP client
+    return [{k: v for k, v in t.items() if v != ''} for t in transactions]
+
+
+def _cached_rows(sheet_id: str) -> Optional[List[List[Any]]]:
+    cached = _READ_CACHE.get(sheet_id)
+    if cached and time.monotonic() - cached[0] < _CACHE_TTL:
+        return cached[2]
+    return None
+
+
+def _sheet_version(sheet_id: str) -> Optional[str]:
+
+    # Sheets has no etag, but Drive bumps the file version on every edit
+    try:
+        file_metadata = execute_with_retry(get_drive_service().files().get(
+            fileId=sheet_id,
+            fields='version'
+        ))
+    except Exception as e:
+        logger.debug("Could not read version of sheet %s: %s", sheet_id, e)
+        return None
+    return file_metadata.get('version')
+
+
+def _read_transaction_rows(sheet_id: str) -> List[List[Any]]:
+
+    # Reuse a recent read of this sheet if we have one
+    cached = _cached_rows(sheet_id)
+    if cached is not None:
+        return cached
+    
+    # Past the TTL, a cheap version check tells us whether the rows we hold
+    # are still current (edits made outside BudgetTrak bump it too)
+    version = _sheet_version(sheet_id)
+    stale = _READ_CACHE.get(sheet_id)
+    if stale and version is not None and stale[1] == version:
+        _READ_CACHE[sheet_id] = (time.monotonic(), version, stale[2])
+        return stale[2]
+    
+    # Read all data (skip header). One full read is shared by every view and
+    # limit; see _fetch_transactions_range for why we don't fetch a tail.
+    values = _fetch_transactions_range(get_sheets_service(), sheet_id, start_row=2)
+    _READ_CACHE[sheet_id] = (time.monotonic(), version, values)
+    return values
+
+
+class TransactionIndex:
+    """
+    Date-sorted transactions with a per-category index, for repeated
+    queries against the same read of a sheet.
+    """
+    
+    def __init__(self, rows: List[List[Any]]):
+        """
+        Build the index.
+        
+        Args:
+            rows: Raw Transactions rows the index is built from
+        """
+        self.rows = rows
+        
+        # Statements from different accounts are appended in any order
+        self.transactions = sorted(_iter_transactions(rows), key=attrgetter('date'))
+        self.dates = [t.date for t in self.transactions]
+        
+        # Each category's transactions stay in date order too
+        self.by_category: Dict[str, List[Txn]] = {}
+        for t in self.transactions:
+            self.by_category.setdefault(t.category.lower(), []).append(t)
+        self.category_dates = {
+            category: [t.date for t in transactions]
+            for category, transactions in self.by_category.items()
+        }
+    
+    def filter(
+        self,
+        category: Optional[str] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        merchant: Optional[str] = None
+    ) -> List[Txn]:
+        """
+        Find matching transactions, in date order.
+        
+        Args:
+            category: Exact category (case-insensitive)
+            start_date: First date to include (YYYY-MM-DD)
+            end_date: Last date to include (YYYY-MM-DD)
+            merchant: Substring of the merchant name (case-insensitive)
+            
+        Returns:
+            Matching transactions
+        """
+        if category:
+            category = category.lower()
+            transactions = self.by_category.get(category, [])
+            dates = self.category_dates.get(category, [])
+        else:
+            transactions = self.transactions
+            dates = self.dates
+        
+        # The date range is a contiguous slice (YYYY-MM-DD strings compare
+        # in date order)
+        lo = bisect_left(dates, start_date) if start_date else 0
+        hi = bisect_right(dates, end_date) if end_date else len(dates)
+        
+        if merchant:
+            merchant = merchant.lower()
+            return [t for t in transactions[lo:hi] if merchant in t.merchant.lower()]
+        return transactions[lo:hi]
+
+
+def _transaction_index(sheet_id: str) -> TransactionIndex:
+
+    # Rebuilt only when the rows are actually re-read from the sheet
+    rows = _read_transaction_rows(sheet_id)
+    index = _INDEX_CACHE.get(sheet_id)
+    if index is None or index.rows is not rows:
+        index = TransactionIndex(rows)
+        _INDEX_CACHE[sheet_id] = index
+    return index
+
+
+def _fetch_transactions_range(service, sheet_id: str, start_row: int) -> List[List[Any]]:
+
+    # Always open-ended. The sheet's gridProperties rowCount can't be used
+    # to compute a tail range: appends insert rows above the ~1000 blank
+    # rows a new tab starts with, so rowCount tracks the grid, not the last
+    # row holding data.
+    result = execute_with_retry(service.spreadsheets().values().get(
         spreadsheetId=sheet_id,
-        range='Transactions!A2:H'  # Skip header
-    ).execute()
+        range=f'Transactions!A{start_row}:H'
+    ))
     
-    values = result.get('values', [])
+    return result.get('values', [])
+
+
+def get_transactions_and_summary(
+    sheet_id: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    limit: int = 100
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+
+    if sheet_id is None:
+        sheet_id = get_sheet_id_from_env()
     
-    # Convert to dictionaries
-    transactions = []
-    for row in values[-limit:]:  # Get last N rows
-        if len(row) >= 5:  # Minimum required columns
-            transactions.append({
-                'date': row[0],
-                'merchant': row[1],
-                'amount': float(row[2]) if row[2] else 0,
-                'category': row[3],
-                'type': row[4],
-                'bank': row[5] if len(row) > 5 else '',
-                'account': row[6] if len(row) > 6 else '',
-                'notes': row[7] if len(row) > 7 else ''
-            })
-    
-    print(f"✅ Retrieved {len(transactions)} transactions")
-    return transactions
+    # One read serves both the recent transactions and the summary; only
+    # the recent ones are kept as dicts
+    rows = _read_transaction_rows(sheet_id)
+    summary = _summarize(_iter_transactions(rows), start_date, end_date)
+    return [t._asdict() for t in _iter_transactions(_tail(rows, limit))], summary
 
 
 def query_transactions(
@@ -152,29 +428,30 @@ def query_transactions(
     sheet_id: Optional[str] = None
 ) -> List[Dict[str, Any]]:
 
-    print(f"🔍 Querying transactions...")
-    print(f"  Filters: category={category}, dates={start_date} to {end_date}, merchant={merchant}")
-    
-    # Get all transactions
-    all_transactions = get_transactions_from_sheet(sheet_id=sheet_id, limit=1000)
-    
-    # Apply filters
-    filtered = all_transactions
-    
-    if category:
-        filtered = [t for t in filtered if t['category'].lower() == category.lower()]
-    
-    if start_date:
-        filtered = [t for t in filtered if t['date'] >= start_date]
+    logger.info("🔍 Querying transactions...")
+    logger.debug("  Filters: category=%s, dates=%s to %s, merchant=%s",
+                 category, start_date, end_date, merchant)
     
-    if end_date:
-        filtered = [t for t in filtered if t['date'] <= end_date]
+    if sheet_id is None:
+        sheet_id = get_sheet_id_from_env()
     
-    if merchant:
-        filtered = [t for t in filtered 
-                   if merchant.lower() in t['merchant'].lower()]
+    # Unless we already hold the rows, have Sheets apply the filters so
+    # only matching rows come over the wire
+    if (category or start_date or end_date or merchant) and _cached_rows(sheet_id) is None:
+        try:
+            filtered = _query_via_gviz(sheet_id, category, start_date, end_date, merchant)
+            logger.info("✅ Found %d matching transactions", len(filtered))
+            return filtered
+        except Exception as e:
+            logger.warning("⚠️  Sheets query failed (%s), filtering locally", e)
+    
+    # Repeated queries against the same rows reuse one index
+    filtered = [
+        t._asdict()
+        for t in _transaction_index(sheet_id).filter(category, start_date, end_date, merchant)
+    ]
     
-    print(f"✅ Found {len(filtered)} matching transactions")
+    logger.info("✅ Found %d matching transactions", len(filtered))
     return filtered
 
 
@@ -184,42 +461,141 @@ def get_spending_summary(
     end_date: Optional[str] = None
 ) -> Dict[str, Any]:
 
-    print(f"📈 Generating spending summary...")
+    logger.info("📈 Generating spending summary...")
     
-    transactions = get_transactions_from_sheet(sheet_id=sheet_id, limit=1000)
+    if sheet_id is None:
+        sheet_id = get_sheet_id_from_env()
     
-    # Filter by date if provided
+    # One read that also fills the row cache, so the advice or query that
+    # usually follows a summary doesn't go back to the API
+    rows = _read_transaction_rows(sheet_id)
+    return _summarize(_iter_transactions(rows), start_date, end_date)
+
+
+def _query_via_gviz(
+    sheet_id: str,
+    category: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    merchant: Optional[str] = None
+) -> List[Dict[str, Any]]:
+
+    # Same matching as TransactionIndex.filter.
+    # Columns: A=Date, B=Merchant, D=Category
+    conditions = []
+    if category:
+        conditions.append(f"lower(D) = {_gviz_literal(category.lower())}")
     if start_date:
-        transactions = [t for t in transactions if t['date'] >= start_date]
+        conditions.append(f"A >= {_gviz_literal(start_date)}")
     if end_date:
-        transactions = [t for t in transactions if t['date'] <= end_date]
+        conditions.append(f"A <= {_gviz_literal(end_date)}")
+    if merchant:
+        conditions.append(f"lower(B) contains {_gviz_literal(merchant.lower())}")
+    
+    # Date order, as TransactionIndex.filter returns them
+    rows = _gviz_query(
+        sheet_id,
+        f"select A, B, C, D, E, F, G, H where {' and '.join(conditions)} order by A"
+    )
+    
+    # Empty cells come back as null rather than ''
+    return [t._asdict() for t in _iter_transactions(
+        ['' if value is None else value for value in row] for row in rows
+    )]
+
+
+def _gviz_literal(value: str) -> str:
+    # The query language has no escape sequences, only a choice of quotes
+    if "'" not in value:
+        return f"'{value}'"
+    if '"' not in value:
+        return f'"{value}"'
+    raise ValueError(f"Cannot quote value for Sheets query: {value!r}")
+
+
+def _gviz_value(cell: Optional[Dict[str, Any]]) -> Any:
+    if cell is None:
+        return None
     
-    # Calculate totals by category
+    value = cell.get('v')
+    
+    # Real date cells come back as "Date(2025,11,31)" with a 0-based month
+    if isinstance(value, str):
+        match = _GVIZ_DATE.match(value)
+        if match:
+            year, month, day = (int(g) for g in match.groups())
+            return f"{year:04d}-{month + 1:02d}-{day:02d}"
+    
+    return value
+
+
+@retry_with_backoff()
+def _gviz_query(sheet_id: str, query: str) -> List[List[Any]]:
+
+    session = get_authorized_session()
+    response = session.get(
+        _GVIZ_URL.format(sheet_id=sheet_id),
+        params={
+            'tqx': 'out:json',
+            'sheet': 'Transactions',
+            'headers': 1,
+            'tq': query,
+        },
+        timeout=30,
+    )
+    response.raise_for_status()
+    
+    match = _GVIZ_PAYLOAD.search(response.text)
+    if not match:
+        raise ValueError("Unexpected response from Sheets query endpoint")
+    
+    payload = json.loads(match.group(1))
+    if payload.get('status') == 'error':
+        errors = payload.get('errors') or [{}]
+        raise ValueError(errors[0].get('detailed_message') or errors[0].get('message'))
+    
+    return [
+        [_gviz_value(cell) for cell in row['c']]
+        for row in payload['table']['rows']
+    ]
+
+
+def _summarize(
+    transactions: Iterable[Txn],
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None
+) -> Dict[str, Any]:
+    
+    # Filter by date and total by category in a single pass
     category_totals = {}
     total_spent = 0
     total_income = 0
+    transaction_count = 0
     
     for t in transactions:
-        category = t['category']
-        amount = t['amount']
-        
-        if category not in category_totals:
-            category_totals[category] = 0
+        date = t.date
+        if start_date and date < start_date:
+            continue
+        if end_date and date > end_date:
+            continue
         
-        category_totals[category] += amount
+        amount = t.amount
+        category = t.category
+        category_totals[category] = category_totals.get(category, 0) + amount
+        transaction_count += 1
         
         if amount > 0:
             total_spent += amount
         else:
-            total_income += abs(amount)
+            total_income -= amount
     
     summary = {
         'total_spent': total_spent,
         'total_income': total_income,
         'net': total_income - total_spent,
         'by_category': category_totals,
-        'transaction_count': len(transactions)
+        'transaction_count': transaction_count
     }
     
-    print(f"✅ Summary generated: {len(category_totals)} categories")
+    logger.info("✅ Summary generated: %d categories", len(category_totals))
     return summary
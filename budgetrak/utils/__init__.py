@@ -1,10 +1,31 @@
 """Utility modules for BudgetTrak"""
-from .google_auth import get_drive_service, get_sheets_service, get_auth_manager
-from .gemini_client import get_gemini_client
+from .google_auth import (
+    get_drive_service,
+    get_sheets_service,
+    get_authorized_session,
+    get_auth_manager,
+)
+from .retry import retry_with_backoff, execute_with_retry, execute_rate_limited
+from .cache import load_cached_json, save_cached_json
 
 __all__ = [
     'get_drive_service',
     'get_sheets_service', 
+    'get_authorized_session',
     'get_auth_manager',
     'get_gemini_client',
+    'load_cached_statement',
+    'retry_with_backoff',
+    'execute_with_retry',
+    'execute_rate_limited',
+    'load_cached_json',
+    'save_cached_json',
 ]
+
+
+def __getattr__(name):
+    # Loaded on first use, since it pulls in the Gemini SDK, PIL and PyMuPDF
+    if name in ('get_gemini_client', 'load_cached_statement'):
+        from . import gemini_client
+        return getattr(gemini_client, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,58 @@
+"""
+On-Disk Cache for BudgetTrak
+
+Stores the results of expensive, repeatable operations (like parsing a
+bank statement with Gemini) as JSON files, so re-running them is free.
+"""
+
+import os
+import json
+import threading
+from pathlib import Path
+from typing import Any, Optional
+
+# Override with BUDGETRAK_CACHE_DIR (defaults to ~/.cache/budgetrak)
+CACHE_DIR = Path(os.getenv("BUDGETRAK_CACHE_DIR") or Path.home() / ".cache" / "budgetrak")
+
+
+def _cache_path(namespace: str, key: str) -> Path:
+    return CACHE_DIR / namespace / f"{key}.json"
+
+
+def load_cached_json(namespace: str, key: str) -> Optional[Any]:
+    """
+    Load a cached result.
+    
+    Args:
+        namespace: Cache subdirectory (e.g. "parsed")
+        key: Cache key, such as a content hash
+        
+    Returns:
+        The cached data, or None on a miss (or an unreadable entry)
+    """
+    try:
+        with open(_cache_path(namespace, key), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_cached_json(namespace: str, key: str, data: Any) -> None:
+    """
+    Store a result in the cache.
+    
+    The file is written under a temporary name and then renamed, so
+    concurrent readers never see a partial entry.
+    
+    Args:
+        namespace: Cache subdirectory (e.g. "parsed")
+        key: Cache key, such as a content hash
+        data: JSON-serializable data to store
+    """
+    path = _cache_path(namespace, key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
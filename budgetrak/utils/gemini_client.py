@@ -7,14 +7,228 @@ Handles all interactions with Google's Gemini AI:
 - Category classification
 """
 
+import hashlib
+import io
+import logging
 import os
+import re
 import json
-from typing import List, Dict, Any, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, List, Dict, Any, Optional, Union
 from pathlib import Path
 
-import google.generativeai as genai
-from PIL import Image
-import fitz  # PyMuPDF
+from typing_extensions import TypedDict
+
+# google.generativeai, PIL and PyMuPDF are slow to import, so they're only
+# loaded once a statement is actually parsed (Sheets-only tools never need them)
+if TYPE_CHECKING:
+    import fitz  # PyMuPDF
+    from PIL import Image
+
+try:
+    import orjson  # Faster on large statement responses
+except ImportError:
+    orjson = None
+
+from .cache import load_cached_json, save_cached_json
+from .retry import retry_with_backoff
+
+logger = logging.getLogger(__name__)
+
+
+# Response schema for statement parsing. Gemini is constrained to emit JSON
+# of exactly this shape (typing_extensions.TypedDict is what the SDK expects).
+class AccountInfo(TypedDict):
+    bank: str
+    account_number: str
+    statement_period_start: str
+    statement_period_end: str
+    beginning_balance: float
+    ending_balance: float
+
+
+class Transaction(TypedDict):
+    date: str
+    merchant: str
+    amount: float
+    category: str
+    type: str
+    description: str
+
+
+class Statement(TypedDict):
+    account_info: AccountInfo
+    transactions: list[Transaction]
+
+
+STATEMENT_GENERATION_CONFIG = {
+    'response_mime_type': 'application/json',
+    'response_schema': Statement,
+}
+
+# Markdown code fence (```json ... ```) around a JSON reply
+_FENCE = re.compile(r'^\s*```(?:json)?\s*|\s*```\s*$', re.IGNORECASE)
+
+# Page rendering and upload settings for statement parsing
+RENDER_ZOOM = 1.75
+JPEG_QUALITY = 85
+DARK_TEXT_MAX = 0x40  # Text colour channels at or below this count as black
+
+# Longer statements are split into batches of pages, sent concurrently
+STATEMENT_PAGES_PER_REQUEST = 10
+MAX_STATEMENT_REQUESTS = 4
+
+DEFAULT_MODEL = "gemini-2.5-flash"
+
+# Bump whenever the prompt, response schema, page rendering or batching
+# changes, so statements parsed the old way are sent to Gemini again
+STATEMENT_PARSE_VERSION = 2
+
+
+def statement_cache_key(digest: str, model_name: str = DEFAULT_MODEL) -> str:
+    """
+    Cache key for a parsed statement.
+    
+    Args:
+        digest: Content hash identifying the PDF (prefixed with its algorithm)
+        model_name: Gemini model that parses it
+        
+    Returns:
+        Key that changes with the PDF, the model and STATEMENT_PARSE_VERSION
+    """
+    model = re.sub(r'[^A-Za-z0-9._-]+', '_', model_name)
+    return f"{digest}-{model}-v{STATEMENT_PARSE_VERSION}"
+
+
+def load_cached_statement(digest: str, model_name: str = DEFAULT_MODEL) -> Optional[Dict[str, Any]]:
+    """
+    Look up an earlier parse of a statement without creating a client.
+    
+    Args:
+        digest: Content hash identifying the PDF (prefixed with its algorithm)
+        model_name: Gemini model that parsed it
+        
+    Returns:
+        The cached parse, or None if there isn't one
+    """
+    return load_cached_json('statements', statement_cache_key(digest, model_name))
+
+
+def _render_pixmap(page: "fitz.Page") -> "fitz.Pixmap":
+    """Rasterize one PDF page."""
+    import fitz  # PyMuPDF
+    
+    # Statements are near black-and-white text, so grayscale at 1.75x
+    # keeps OCR accuracy with a third of the pixel data
+    return page.get_pixmap(matrix=fitz.Matrix(RENDER_ZOOM, RENDER_ZOOM), colorspace=fitz.csGRAY)
+
+
+def _render_page(page: "fitz.Page") -> "Image.Image":
+    """Render one PDF page to a PIL image."""
+    from PIL import Image
+    
+    pix = _render_pixmap(page)
+    return Image.frombytes("L", [pix.width, pix.height], pix.samples)
+
+
+def _render_upload_part(page: "fitz.Page") -> Dict[str, Any]:
+    """Render one PDF page as an inline image part for Gemini."""
+    pix = _render_pixmap(page)
+    
+    # Pages with only black text and no embedded images (logos, cheque
+    # scans) lose nothing as a 1-bit PNG, at a fraction of the bytes.
+    # Anything with gray or coloured text keeps the grayscale JPEG.
+    if not page.get_images() and _has_only_dark_text(page):
+        from PIL import Image
+        
+        # A threshold picked per page rather than dithering, which would
+        # turn the anti-aliased edges of glyphs into speckle
+        img = Image.frombytes("L", [pix.width, pix.height], pix.samples)
+        threshold = _otsu_threshold(img.histogram())
+        img = img.point(lambda v: 255 if v > threshold else 0, mode='1')
+        buffer = io.BytesIO()
+        img.save(buffer, 'PNG', optimize=True)
+        return {'mime_type': 'image/png', 'data': buffer.getvalue()}
+    
+    # MuPDF encodes the JPEG itself, so the pixels never pass through PIL
+    # (otherwise the SDK would also upload each page as a much larger PNG)
+    return {'mime_type': 'image/jpeg', 'data': pix.tobytes('jpeg', jpg_quality=JPEG_QUALITY)}
+
+
+def _has_only_dark_text(page: "fitz.Page") -> bool:
+    """Whether every text span on the page is (near) black."""
+    # Light-gray labels and secondary lines wouldn't survive thresholding
+    for block in page.get_text("dict")["blocks"]:
+        for line in block.get("lines", []):
+            for span in line["spans"]:
+                color = span["color"]
+                if max(color >> 16, (color >> 8) & 0xFF, color & 0xFF) > DARK_TEXT_MAX:
+                    return False
+    return True
+
+
+def _otsu_threshold(histogram: List[int]) -> int:
+    """Gray level that best separates ink from background (Otsu's method)."""
+    total = sum(histogram)
+    total_sum = sum(level * count for level, count in enumerate(histogram))
+    
+    dark_count = 0
+    dark_sum = 0
+    best_variance = -1.0
+    threshold = 127
+    
+    # Levels up to and including the threshold count as ink
+    for level, count in enumerate(histogram):
+        dark_count += count
+        light_count = total - dark_count
+        if dark_count == 0:
+            continue
+        if light_count == 0:
+            break
+        
+        dark_sum += level * count
+        dark_mean = dark_sum / dark_count
+        light_mean = (total_sum - dark_sum) / light_count
+        variance = dark_count * light_count * (dark_mean - light_mean) ** 2
+        if variance > best_variance:
+            best_variance = variance
+            threshold = level
+    
+    return threshold
+
+
+def _transaction_key(transaction: Dict[str, Any]) -> tuple:
+    """Identify a transaction for de-duplication across page batches."""
+    return (transaction.get('date'), transaction.get('amount'), transaction.get('merchant'))
+
+
+def _boundary_overlap(previous: List[Dict[str, Any]], transactions: List[Dict[str, Any]]) -> int:
+    """Count leading transactions that repeat the end of the previous batch."""
+    if not previous or not transactions:
+        return 0
+    
+    # Only the final run of the previous batch sharing its last date can
+    # have been cut by the page break; identical charges elsewhere are real
+    last_date = previous[-1].get('date')
+    run = 0
+    while run < len(previous) and previous[-1 - run].get('date') == last_date:
+        run += 1
+    
+    # Longest end of that run that the next batch starts with
+    tail = [_transaction_key(t) for t in previous[-run:]]
+    head = [_transaction_key(t) for t in transactions[:run]]
+    for size in range(min(run, len(head)), 0, -1):
+        if tail[-size:] == head[:size]:
+            return size
+    return 0
+
+
+def _dumps_indented(data: Any) -> str:
+    """Serialize data as indented JSON for a prompt."""
+    if orjson:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2).decode()
+    return json.dumps(data, indent=2)
 
 
 class GeminiClient:
@@ -27,7 +241,7 @@ class GeminiClient:
     - Providing budget advice
     """
     
-    def __init__(self, api_key: Optional[str] = None, model_name: str = "gemini-2.5-flash"):
+    def __init__(self, api_key: Optional[str] = None, model_name: str = DEFAULT_MODEL):
         """
         Initialize Gemini client.
         
@@ -43,41 +257,78 @@ class GeminiClient:
             )
         
         # Configure Gemini
+        import google.generativeai as genai
+        
         genai.configure(api_key=self.api_key)
+        self.model_name = model_name
         self.model = genai.GenerativeModel(model_name)
-        print(f"✅ Gemini client initialized with model: {model_name}")
+        logger.info("✅ Gemini client initialized with model: %s", model_name)
     
-    def pdf_to_images(self, pdf_path: str) -> List[Image.Image]:
+    @retry_with_backoff()
+    def generate_content(self, contents, model=None, **kwargs):
+        """
+        Call Gemini, retrying rate limits and transient server errors.
+        
+        Args:
+            contents: Prompt (and images) to send
+            model: GenerativeModel to use instead of the default one
+            **kwargs: Passed through to generate_content
+            
+        Returns:
+            Gemini response
+        """
+        return (model or self.model).generate_content(contents, **kwargs)
+    
+    def pdf_to_images(self, pdf: Union[str, bytes]) -> List["Image.Image"]:
         """
         Convert PDF pages to PIL images.
         
         Args:
-            pdf_path: Path to PDF file
+            pdf: Path to PDF file, or the raw PDF bytes
             
         Returns:
             List of PIL Image objects (one per page)
         """
-        print(f"📄 Converting PDF to images: {pdf_path}")
-        images = []
+        return self._render_pdf(pdf, _render_page)
+    
+    def pdf_to_upload_parts(self, pdf: Union[str, bytes]) -> List[Dict[str, Any]]:
+        """
+        Convert PDF pages to image parts, ready to send to Gemini.
         
-        # Open PDF
-        pdf_document = fitz.open(pdf_path)
+        Text-only pages become 1-bit PNGs; pages with embedded images
+        become grayscale JPEGs.
         
-        # Convert each page to image
-        for page_num in range(pdf_document.page_count):
-            page = pdf_document[page_num]
-            
-            # Render page to image (higher resolution for better OCR)
-            pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))  # 2x zoom for clarity
+        Args:
+            pdf: Path to PDF file, or the raw PDF bytes
             
-            # Convert to PIL Image
-            img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-            images.append(img)
-            print(f"  ✓ Page {page_num + 1}/{pdf_document.page_count}")
+        Returns:
+            List of {'mime_type', 'data'} dicts (one per page)
+        """
+        return self._render_pdf(pdf, _render_upload_part)
+    
+    def _render_pdf(self, pdf: Union[str, bytes], render: Callable) -> List[Any]:
+        """Apply render to every page of a PDF, in page order."""
+        import fitz  # PyMuPDF
         
+        # Open PDF (from memory when we already have the bytes)
+        if isinstance(pdf, (bytes, bytearray)):
+            logger.debug("📄 Converting PDF to images: <%d bytes in memory>", len(pdf))
+            pdf_document = fitz.open(stream=pdf, filetype="pdf")
+        else:
+            logger.debug("📄 Converting PDF to images: %s", pdf)
+            pdf_document = fitz.open(pdf)
+        
+        # Convert each page to image. Pages are rendered one after another:
+        # PyMuPDF is not thread-safe, and a process pool costs more to start
+        # than rendering a typical statement takes.
+        pages = []
+        for page_num in range(pdf_document.page_count):
+            pages.append(render(pdf_document[page_num]))
+            logger.debug("  ✓ Page %d/%d", page_num + 1, pdf_document.page_count)
         pdf_document.close()
-        print(f"✅ Converted {len(images)} pages")
-        return images
+        
+        logger.info("✅ Converted %d pages", len(pages))
+        return pages
     
     def parse_bank_statement(self, pdf_path: str) -> Dict[str, Any]:
         """
@@ -98,11 +349,76 @@ class GeminiClient:
             - account_info: {bank, account_number, period, balances}
             - transactions: List of {date, merchant, amount, category, type}
         """
-        print(f"\n🧠 Parsing bank statement with Gemini AI...")
+        # Read once; the bytes are both hashed and rendered
+        return self.parse_bank_statement_bytes(Path(pdf_path).read_bytes())
+    
+    def parse_bank_statement_bytes(self, pdf_bytes: bytes, digest: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Parse a bank statement PDF that is already in memory.
         
-        # Convert PDF to images
-        images = self.pdf_to_images(pdf_path)
+        Same as parse_bank_statement, but skips the round-trip through disk
+        for PDFs downloaded straight from Drive. Results are cached on disk
+        by content hash, model and STATEMENT_PARSE_VERSION, so the same
+        statement is only sent to Gemini once per parser revision.
         
+        Args:
+            pdf_bytes: Raw PDF file contents
+            digest: Content hash already known for the PDF, such as Drive's
+                md5Checksum (default: a BLAKE2b hash of pdf_bytes)
+            
+        Returns:
+            Same structure as parse_bank_statement
+        """
+        # Re-parsing an identical PDF reuses the earlier result
+        if digest is None:
+            digest = "blake2b-" + hashlib.blake2b(pdf_bytes, digest_size=16).hexdigest()
+        key = statement_cache_key(digest, self.model_name)
+        data = load_cached_json('statements', key)
+        if data is not None:
+            logger.info("♻️  Using cached parse for statement %s", key)
+            return data
+        
+        logger.info("🧠 Parsing bank statement with Gemini AI...")
+        data = self._parse_statement_parts(self.pdf_to_upload_parts(pdf_bytes))
+        save_cached_json('statements', key, data)
+        return data
+    
+    def _parse_statement_parts(self, pages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Parse rendered statement pages, in concurrent batches if it's long."""
+        if len(pages) <= STATEMENT_PAGES_PER_REQUEST:
+            return self._request_statement(pages)
+        
+        # One request per batch of pages, so long statements aren't
+        # processed (and timed out) as a single giant request
+        starts = range(0, len(pages), STATEMENT_PAGES_PER_REQUEST)
+        batches = [pages[i:i + STATEMENT_PAGES_PER_REQUEST] for i in starts]
+        notes = [
+            f"\n**NOTE:** These are pages {i + 1}-{i + len(batch)} of a {len(pages)}-page "
+            f"statement. Extract only the transactions shown on these pages."
+            for i, batch in zip(starts, batches)
+        ]
+        logger.info("  Sending %d pages as %d concurrent requests", len(pages), len(batches))
+        
+        with ThreadPoolExecutor(max_workers=min(len(batches), MAX_STATEMENT_REQUESTS)) as pool:
+            results = list(pool.map(self._request_statement, batches, notes))
+        
+        # Account details come from the first pages (where the summary is)
+        data = {'account_info': results[0]['account_info'], 'transactions': []}
+        previous = []
+        for result in results:
+            transactions = result.get('transactions', [])
+            
+            # A transaction split across a page break may be read by both
+            # batches; drop it from the start of the later one
+            skip = _boundary_overlap(previous, transactions)
+            data['transactions'].extend(transactions[skip:])
+            previous = transactions
+        
+        logger.info("✅ Parsed %d transactions", len(data['transactions']))
+        return data
+    
+    def _request_statement(self, pages: List[Dict[str, Any]], note: str = "") -> Dict[str, Any]:
+        """Send rendered statement pages to Gemini and parse the JSON reply."""
         # Create the prompt (this is crucial for good results!)
         prompt = """You are a financial data extraction expert. Analyze this bank statement and extract ALL transactions with perfect accuracy.
 
@@ -164,31 +480,25 @@ Return ONLY valid JSON (no markdown, no explanation). Use this exact structure:
 """
         
         # Send to Gemini with all images
-        print("  📤 Sending to Gemini AI...")
-        response = self.model.generate_content([prompt] + images)
+        logger.debug("  📤 Sending to Gemini AI...")
+        response = self.generate_content(
+            [prompt + note] + pages,
+            generation_config=STATEMENT_GENERATION_CONFIG
+        )
         
         # Parse response
-        print("  📥 Processing response...")
-        response_text = response.text.strip()
-        
+        logger.debug("  📥 Processing response...")
         # Remove markdown code blocks if present
-        if response_text.startswith("```json"):
-            response_text = response_text[7:]
-        if response_text.startswith("```"):
-            response_text = response_text[3:]
-        if response_text.endswith("```"):
-            response_text = response_text[:-3]
-        
-        response_text = response_text.strip()
+        response_text = _FENCE.sub('', response.text).strip()
         
         # Parse JSON
         try:
-            data = json.loads(response_text)
-            print(f"✅ Parsed {len(data.get('transactions', []))} transactions")
+            data = orjson.loads(response_text) if orjson else json.loads(response_text)
+            logger.info("✅ Parsed %d transactions", len(data.get('transactions', [])))
             return data
         except json.JSONDecodeError as e:
-            print(f"❌ Failed to parse JSON: {e}")
-            print(f"Response: {response_text[:500]}...")
+            logger.error("❌ Failed to parse JSON: %s", e)
+            logger.error("Response: %s...", response_text[:500])
             raise
     
     def get_budget_advice(self, transactions: List[Dict], current_balance: float) -> str:
@@ -202,7 +512,7 @@ Return ONLY valid JSON (no markdown, no explanation). Use this exact structure:
         Returns:
             Budget advice as a formatted string
         """
-        print("\n💡 Generating budget advice...")
+        logger.info("💡 Generating budget advice...")
         
         # Create summary for Gemini
         summary = {
@@ -214,7 +524,7 @@ Return ONLY valid JSON (no markdown, no explanation). Use this exact structure:
         prompt = f"""You are a financial advisor. Analyze these transactions and provide personalized budget advice.
 
 Transaction data:
-{json.dumps(summary, indent=2)}
+{_dumps_indented(summary)}
 
 Provide advice on:
 1. Top spending categories
@@ -226,12 +536,13 @@ Provide advice on:
 Be specific, actionable, and encouraging. Format your response in clear sections with bullet points.
 """
         
-        response = self.model.generate_content(prompt)
+        response = self.generate_content(prompt)
         return response.text
 
 
 # Singleton instance
 _gemini_client: Optional[GeminiClient] = None
+_gemini_client_lock = threading.Lock()
 
 
 def get_gemini_client() -> GeminiClient:
@@ -242,6 +553,7 @@ def get_gemini_client() -> GeminiClient:
         GeminiClient instance
     """
     global _gemini_client
-    if _gemini_client is None:
-        _gemini_client = GeminiClient()
+    with _gemini_client_lock:
+        if _gemini_client is None:
+            _gemini_client = GeminiClient()
     return _gemini_client
@@ -5,22 +5,33 @@ Handles OAuth2 authentication for Google Drive and Sheets APIs.
 Supports both OAuth credentials (for personal use) and Service Accounts (for automation).
 """
 
+import logging
 import os
 import pickle
+import threading
 from pathlib import Path
 from typing import Optional
 
-from google.auth.transport.requests import Request
+from google.auth.transport.requests import AuthorizedSession, Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 
+logger = logging.getLogger(__name__)
+
 # Google API Scopes - what permissions we need
 SCOPES = [
     'https://www.googleapis.com/auth/drive',  # Full Drive access
     'https://www.googleapis.com/auth/spreadsheets',  # Sheets read/write
 ]
 
+# Where tokens were stored before they were saved as JSON
+LEGACY_TOKEN_PATH = "token.pickle"
+
+# Use the discovery documents bundled with google-api-python-client instead
+# of fetching them over HTTPS (there is then nothing to cache either)
+BUILD_OPTIONS = {'static_discovery': True, 'cache_discovery': False}
+
 
 class GoogleAuthManager:
     """
@@ -40,8 +51,14 @@ class GoogleAuthManager:
             credentials_path: Path to OAuth credentials JSON file
         """
         self.credentials_path = credentials_path
-        self.token_path = "token.pickle"
+        self.token_path = "token.json"
         self._creds: Optional[Credentials] = None
+        
+        # Built service objects are reused across calls; building one
+        # parses the discovery document and sets up a fresh HTTP client.
+        # They are kept per thread since their httplib2.Http is not thread-safe.
+        self._local = threading.local()
+        self._lock = threading.Lock()
     
     def authenticate(self) -> Credentials:
         """
@@ -58,17 +75,23 @@ class GoogleAuthManager:
         """
         # Check if we have saved credentials
         if os.path.exists(self.token_path):
-            print("📂 Loading saved credentials...")
-            with open(self.token_path, 'rb') as token:
+            logger.debug("📂 Loading saved credentials...")
+            self._creds = Credentials.from_authorized_user_file(self.token_path, SCOPES)
+        elif os.path.exists(LEGACY_TOKEN_PATH):
+            # Older versions pickled the credentials; load once, then the
+            # token is re-saved as JSON below
+            logger.info("📂 Migrating %s to %s...", LEGACY_TOKEN_PATH, self.token_path)
+            with open(LEGACY_TOKEN_PATH, 'rb') as token:
                 self._creds = pickle.load(token)
+            self._save_credentials()
         
         # If no valid credentials, get new ones
         if not self._creds or not self._creds.valid:
             if self._creds and self._creds.expired and self._creds.refresh_token:
-                print("🔄 Refreshing expired token...")
+                logger.info("🔄 Refreshing expired token...")
                 self._creds.refresh(Request())
             else:
-                print("🔐 Running OAuth flow (browser will open)...")
+                logger.warning("🔐 Running OAuth flow (browser will open)...")
                 if not os.path.exists(self.credentials_path):
                     raise FileNotFoundError(
                         f"Credentials file not found: {self.credentials_path}\n"
@@ -81,40 +104,76 @@ class GoogleAuthManager:
                 self._creds = flow.run_local_server(port=0)
             
             # Save credentials for next time
-            print("💾 Saving credentials...")
-            with open(self.token_path, 'wb') as token:
-                pickle.dump(self._creds, token)
+            self._save_credentials()
         
-        print("✅ Authentication successful!")
+        logger.info("✅ Authentication successful!")
         return self._creds
     
+    def _save_credentials(self) -> None:
+        """Write the current credentials to token_path as JSON."""
+        logger.debug("💾 Saving credentials...")
+        with open(self.token_path, 'w') as token:
+            token.write(self._creds.to_json())
+    
     def get_drive_service(self):
         """
-        Create and return Google Drive API service.
+        Create (once per thread) and return Google Drive API service.
         
         Returns:
             Google Drive API service object
         """
-        if not self._creds:
-            self.authenticate()
+        service = getattr(self._local, 'drive_service', None)
+        if service is None:
+            with self._lock:
+                if not self._creds:
+                    self.authenticate()
+            service = build('drive', 'v3', credentials=self._creds, **BUILD_OPTIONS)
+            self._local.drive_service = service
         
-        return build('drive', 'v3', credentials=self._creds)
+        return service
     
     def get_sheets_service(self):
         """
-        Create and return Google Sheets API service.
+        Create (once per thread) and return Google Sheets API service.
         
         Returns:
             Google Sheets API service object
         """
-        if not self._creds:
-            self.authenticate()
+        service = getattr(self._local, 'sheets_service', None)
+        if service is None:
+            with self._lock:
+                if not self._creds:
+                    self.authenticate()
+            service = build('sheets', 'v4', credentials=self._creds, **BUILD_OPTIONS)
+            self._local.sheets_service = service
+        
+        return service
+    
+    def get_authorized_session(self) -> AuthorizedSession:
+        """
+        Create (once per thread) and return an authorized HTTP session.
+        
+        Used for Google endpoints without a discovery-based client, such
+        as the Sheets visualization query endpoint. Reusing the session
+        keeps its connection pool, so repeat queries skip the TLS handshake.
+        
+        Returns:
+            requests session that attaches (and refreshes) our OAuth token
+        """
+        session = getattr(self._local, 'authorized_session', None)
+        if session is None:
+            with self._lock:
+                if not self._creds:
+                    self.authenticate()
+            session = AuthorizedSession(self._creds)
+            self._local.authorized_session = session
         
-        return build('sheets', 'v4', credentials=self._creds)
+        return session
 
 
 # Singleton instance for easy access
 _auth_manager: Optional[GoogleAuthManager] = None
+_auth_manager_lock = threading.Lock()
 
 
 def get_auth_manager(credentials_path: str = "budgetrak_credentials.json") -> GoogleAuthManager:
@@ -128,8 +187,9 @@ def get_auth_manager(credentials_path: str = "budgetrak_credentials.json") -> Go
         GoogleAuthManager instance
     """
     global _auth_manager
-    if _auth_manager is None:
-        _auth_manager = GoogleAuthManager(credentials_path)
+    with _auth_manager_lock:
+        if _auth_manager is None:
+            _auth_manager = GoogleAuthManager(credentials_path)
     return _auth_manager
 
 
@@ -151,3 +211,13 @@ def get_sheets_service():
         Google Sheets API service
     """
     return get_auth_manager().get_sheets_service()
+
+
+def get_authorized_session():
+    """
+    Quick access to an authorized HTTP session.
+    
+    Returns:
+        google.auth AuthorizedSession
+    """
+    return get_auth_manager().get_authorized_session()
@@ -0,0 +1,137 @@
+"""
+Retry Utility
+
+Retries Google API calls (Gemini, Drive, Sheets) that fail with rate limits
+(429) or transient server errors (5xx), using jittered exponential backoff.
+"""
+
+import logging
+import time
+import random
+import functools
+from typing import Any, Callable, Collection, Optional
+
+from googleapiclient.errors import HttpError
+
+logger = logging.getLogger(__name__)
+
+# HTTP statuses worth retrying for googleapiclient and requests calls
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+# Rate-limited requests are rejected before doing anything, so these are
+# safe to retry even for requests that aren't idempotent
+RATE_LIMIT_STATUSES = {429}
+
+
+def _is_retryable(error: Exception, statuses: Collection[int]) -> bool:
+    # requests and google.api_core are imported here rather than at the top:
+    # api_core pulls in grpc and the protobuf stubs when they're installed,
+    # which Drive/Sheets-only tools shouldn't pay for just to import this
+    import requests
+    from google.api_core import exceptions as api_exceptions
+    
+    if isinstance(error, HttpError):
+        return error.resp.status in statuses
+    if isinstance(error, requests.HTTPError):
+        return error.response is not None and error.response.status_code in statuses
+    
+    # Equivalent errors raised by the Gemini client
+    return isinstance(error, (
+        api_exceptions.TooManyRequests,
+        api_exceptions.ResourceExhausted,
+        api_exceptions.InternalServerError,
+        api_exceptions.ServiceUnavailable,
+        api_exceptions.DeadlineExceeded,
+    ))
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    import requests
+    
+    # Honour the server's Retry-After header (seconds) when it sends one
+    if isinstance(error, HttpError):
+        value = error.resp.get('retry-after')
+    elif isinstance(error, requests.HTTPError) and error.response is not None:
+        value = error.response.headers.get('Retry-After')
+    else:
+        return None
+    
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_with_backoff(
+    max_attempts: int = 5,
+    base: float = 1.0,
+    max_delay: float = 60.0,
+    statuses: Collection[int] = RETRYABLE_STATUSES
+) -> Callable:
+    """
+    Decorator that retries rate-limited and transient Google API errors.
+    
+    Waits min(max_delay, base * 2**attempt) plus up to `base` seconds of
+    random jitter between attempts, or the Retry-After delay if given.
+    Any other error is raised immediately.
+    
+    Args:
+        max_attempts: Total number of attempts before giving up
+        base: Initial delay in seconds
+        max_delay: Upper bound for a single delay in seconds
+        statuses: HTTP statuses to retry
+        
+    Returns:
+        Decorator for the function to retry
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            for attempt in range(max_attempts):
+                try:
+                    return func(*args, **kwargs)
+                except Exception as e:
+                    if attempt == max_attempts - 1 or not _is_retryable(e, statuses):
+                        raise
+                    
+                    delay = _retry_after(e)
+                    if delay is None:
+                        delay = min(max_delay, base * 2 ** attempt) + random.uniform(0, base)
+                    delay = min(delay, max_delay)
+                    
+                    logger.warning("⏳ %s, retrying in %.1fs (attempt %d/%d)",
+                                   type(e).__name__, delay, attempt + 1, max_attempts)
+                    time.sleep(delay)
+        return wrapper
+    return decorator
+
+
+@retry_with_backoff()
+def execute_with_retry(request) -> Any:
+    """
+    Execute a googleapiclient request, retrying transient failures.
+    
+    Args:
+        request: Request object, e.g. service.files().list(...)
+        
+    Returns:
+        The request's response
+    """
+    return request.execute()
+
+
+@retry_with_backoff(statuses=RATE_LIMIT_STATUSES)
+def execute_rate_limited(request) -> Any:
+    """
+    Execute a googleapiclient request that must not run twice.
+    
+    Only rate limits are retried: after a 5xx the request (e.g. an append)
+    may already have been applied.
+    
+    Args:
+        request: Request object, e.g. service.spreadsheets().values().append(...)
+        
+    Returns:
+        The request's response
+    """
+    return request.execute()
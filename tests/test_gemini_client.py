@@ -0,0 +1,55 @@
+"""Tests for statement page rendering in budgetrak.utils.gemini_client."""
+
+import io
+
+import pytest
+
+fitz = pytest.importorskip("fitz")
+Image = pytest.importorskip("PIL.Image")
+pytest.importorskip("googleapiclient")
+pytest.importorskip("google_auth_oauthlib")
+
+from budgetrak.utils.gemini_client import _otsu_threshold, _render_upload_part
+
+
+def _page_with_text(color):
+    doc = fitz.open()
+    page = doc.new_page()
+    for i in range(20):
+        page.insert_text((40, 60 + 14 * i), f"2024-01-{i + 1:02d}  COFFEE SHOP  $4.50",
+                         fontsize=10, color=color)
+    return doc, page
+
+
+def _ink_pixels(part):
+    img = Image.open(io.BytesIO(part['data'])).convert("L")
+    return sum(img.histogram()[:230])
+
+
+def test_black_text_page_is_sent_as_1bit_png():
+    doc, page = _page_with_text((0, 0, 0))
+    part = _render_upload_part(page)
+    
+    assert part['mime_type'] == 'image/png'
+    assert Image.open(io.BytesIO(part['data'])).mode == '1'
+    assert _ink_pixels(part) > 0
+
+
+@pytest.mark.parametrize("gray", [0.5, 0.6, 0.65, 0.8])
+def test_gray_text_survives(gray):
+    doc, black_page = _page_with_text((0, 0, 0))
+    black_ink = _ink_pixels(_render_upload_part(black_page))
+    
+    doc, gray_page = _page_with_text((gray, gray, gray))
+    gray_ink = _ink_pixels(_render_upload_part(gray_page))
+    
+    # Roughly as much of the text is visible as when it's black
+    assert gray_ink > black_ink * 0.5
+
+
+def test_otsu_threshold_splits_ink_from_background():
+    histogram = [0] * 256
+    histogram[20] = 1000
+    histogram[240] = 50000
+    
+    assert 20 <= _otsu_threshold(histogram) < 240